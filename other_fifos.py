@@ -1,14 +1,15 @@
 from collections import deque
-from dataclasses import dataclass
-from typing import Hashable
 
 from s3fifo import S3FIFO
 
-@dataclass(slots=True)
 class S3FIFOItem:
-    key: Hashable
-    value: any
-    freq: int = 0
+    # key: Hashable, value: any, freq: int
+    __slots__ = ('key', 'value', 'freq')
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.freq = 0
 
 # These next two are Like S3FIFO, but S3FIFO3 removes a single item at a time from
 # evictS() and S3FIFO4 promotes consecutive items if possible, but stops when
@@ -38,27 +39,48 @@ class S3FIFOItem:
 #     - otherwise same as S3FIFO3.
 class S3FIFO3(S3FIFO):
     def evictS(self):
-        if len(self.S) > 0:
+        if self.s_len > 0:
             # Move the tail item to another queue.
-            tail_item = self.S.pop()
-            if tail_item.freq > 0:
-                self.insertM(tail_item)
+            tail = self.S.pop()
+            self.s_len -= 1
+            if self.slots_freq[tail] > 0:
+                self.insertM(tail)
             else:
-                self.insertG(tail_item)
+                self.insertG(tail)
 
 class S3FIFO4(S3FIFO):
     def evictS(self):
-        if len(self.S) > 0:
-            tail_item = self.S.pop()
+        if self.s_len > 0:
+            tail = self.S.pop()
+            self.s_len -= 1
             # Promote all eligible items to M
-            if tail_item.freq > 0:
-                self.insertM(tail_item)
-                while len(self.S) > 0:
-                    tail_item = self.S.pop()
-                    self.insertM(tail_item)
+            if self.slots_freq[tail] > 0:
+                self.insertM(tail)
+                while self.s_len > 0:
+                    tail = self.S.pop()
+                    self.s_len -= 1
+                    self.insertM(tail)
             # Or, if the next item is not promotable, evict it.
             else:
-                self.insertG(tail_item)
+                self.insertG(tail)
+
+class S3FIFO_1bit(S3FIFO):
+    # Like S3FIFO, but with a single reference bit per item rather than a
+    # 2-bit clock, so items in M get one reinsertion at most.
+    #
+    # This only exists to compare hit rates against S3FIFO, so its speed
+    # doesn't matter: a miss looks the key up here and again in S3FIFO.get.
+    def get(self, key):
+        idx = self.table.get(key)
+        if idx is not None and self.slots_freq[idx] < 128:
+            self.hits += 1
+            self.slots_freq[idx] = 1
+            return self.slots_val[idx]
+        return super().get(key)
+
+    def get_many(self, keys):
+        # S3FIFO.get_many inlines S3FIFO's hit path.
+        return [self.get(key) for key in keys]
 
 class EagerEvictionS3FIFO:
     # A bad version of S3FIFO.
@@ -93,7 +115,7 @@ class EagerEvictionS3FIFO:
                 self.insertM(item)
             else:
                 self.hits += 1
-                item.freq = min(item.freq + 1, 3)
+                item.freq = (1, 2, 3, 3)[item.freq]
         else:
             self.misses += 1
             value = self.func(key)
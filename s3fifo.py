@@ -1,14 +1,6 @@
 # Copyright Colin Caine 2023. MIT License.
 
 from collections import deque
-from dataclasses import dataclass
-from typing import Hashable
-
-@dataclass(slots=True)
-class S3FIFOItem:
-    key: Hashable
-    value: any
-    freq: int = 0
 
 class S3FIFO:
     """Cache calls to a function with S3FIFO.
@@ -45,6 +37,9 @@ class S3FIFO:
     # Gets the return value of `some_callable(some_key)` or the saved
     # return value of an earlier call of `some_callable(some_key)`.
     value = cache.get(some_key)
+
+    # Or several at once, which is faster when most of them are cached.
+    values = cache.get_many(some_keys)
     ```
 
     `get` and `some_callable` must accept a single value and that value must be
@@ -87,13 +82,19 @@ class S3FIFO:
     S3-FIFO consists of an index (a dict in this implementation) and three
     FIFOs (queues): small (S), main (M), and ghost (G).
 
-    Cached entries are stored as Items, which have a key, value, and an integer
-    we call `freq` that starts at 0. `value` will initially be func(key), where
-    func is the callable argument given in the S3FIFO constructor, but can be
-    set to None if the item is evicted from the cache.
+    Cached entries are stored as a Structure-of-Arrays: a pool of slots, where
+    slot `i` is `slots_key[i]`, `slots_val[i]` and `slots_freq[i]`, an integer
+    that starts at 0. `slots_freq` is a compact `bytearray`, so scanning it
+    doesn't chase pointers to lots of separate objects. The index maps keys to
+    slot indices, and the FIFOs contain slot indices. A slot's value will
+    initially be func(key), where func is the callable argument given in the
+    S3FIFO constructor, but is set to None when the slot is demoted to G.
+    Every entry in a FIFO owns a slot, so the pool is allocated once at
+    construction and we never allocate objects for entries after that.
 
     If a key is not in the index then we evict an item if the cache is full and
-    then insert a new Item into the index and S.
+    then take a slot from the free list for the new item and insert it into the
+    index and S.
 
     Items are only evicted or promoted from any queue if a new value is
     inserted when the cache is full (len(S)+len(M) == size).
@@ -109,37 +110,42 @@ class S3FIFO:
     size, otherwise we try to evict from S (which can fail if it promotes a
     value to M instead). If S promotes then we loop, which will end up with us
     evicting from M. Either way, we evict one item. This loop is in
-    ensure_free().
+    get().
       - evictM() chooses an item to evict from the main FIFO
           - Eviction strategy is FIFO-Reinsertion with CLOCK-2
           - CLOCK-2 is a 2-bit clock for each item in the cache. On each
             cache-hit the clock is incremented if it is less than 3. We use
-            item.freq as the clock value.
+            slots_freq as the clock value.
           - FIFO-Reinsertion: we pop an item and if its clock is > 0 it is
             pushed to the other end of the queue with clock reduced by 1. We
             keep trying until we see an item with clock == 0, then we evict
             that item.
-          - Evicting an item means deleting it from the index, and setting its
-            value to None (allows it to be garbage collected even if ghost FIFO
-            retains a referece to it)
+          - Evicting an item means deleting it from the index, setting its key
+            and value to None (allows them to be garbage collected) and
+            returning its slot to the free list.
       - evictS() either promotes items to the main FIFO if they have been
         accessed at least once or demotes a single item to the ghost FIFO if
         they have not been accessed. Demotion to ghost counts as an eviction.
           - Promoted items have their clock reset to 0 and are enqueued in M.
           - Demoted items are not counted against our cache size because we set
-            their value=None to allow garbage collection. We also set freq = -1
+            their value=None to allow garbage collection. We also set freq = 255
             so that we can identify them.
-          - If an item is demoted and the ghost FIFO is free, then the ghost
-            FIFO will pop its last item. If the popped item is not also in M,
-            then it is deleted from the index. If item.freq < 0 then item is
-            not in M.
-
-    When we have a cache-hit we check if the hit item is in ghost FIFO:
-      - if item.freq < 0, then item is in ghost GIFO.
-          - recalculate the value: item.value = func(item.key)
-          - promote into M by setting item.freq = 0 and enqueueing
-          - no need to touch the ghost FIFO
-      - else: increase the freq by 1, up to a maximum of 3 (2-bit clock)
+          - If an item is demoted and the ghost FIFO is full, then the ghost
+            FIFO will pop its last slot and free it. If the slot's freq is 255
+            then its key is also deleted from the index. If the freq is 254
+            then the ghost is stale (see below) and the key was re-adopted into
+            M under another slot.
+
+    When we find a key in the index we check if it is in the ghost FIFO:
+      - if freq >= 128, then item is in ghost GIFO.
+          - recalculate the value: value = func(key)
+          - mark the ghost slot as stale by setting its freq = 254
+          - promote into M by putting the key and value in a new slot with
+            freq = 0 and enqueueing that
+          - no need to touch the ghost FIFO, the stale slot will be freed
+            when it reaches the end of G
+      - else: cache hit! Increase the freq by 1, up to a maximum of 3 (2-bit
+        clock)
 
     Because S is usually small and is the queue that new values are inserted
     into, items in it are eligible for eviction sooner than the average item in
@@ -174,82 +180,69 @@ class S3FIFO:
         # Stats
         self.hits = self.hit_ghosts = self.misses = 0
 
-        # hashtable of key => Item for each item in S, M, G
+        # Slots. Each entry in S, M or G owns one slot, so we need enough for
+        # a full cache plus a full G.
+        num_slots = self.maxlen + self.target_len_m
+        self.slots_key = [None] * num_slots
+        self.slots_val = [None] * num_slots
+        self.slots_freq = bytearray(num_slots)
+        self.free = list(range(num_slots))
+
+        # hashtable of key => slot index for each key in S, M, G
         self.table = {}
-        # FIFOs of Items
+        # FIFOs of slot indices. These are deques rather than ring buffers in
+        # an array because any ring buffer written in Python is several times
+        # slower than deque's C methods. The indices are the int objects in
+        # self.free, so pushing them doesn't allocate.
         self.S = deque()
         self.M = deque()
         self.G = deque()
+        # Lengths of S, M and G. Every push or pop must update these.
+        self.s_len = self.m_len = self.g_len = 0
 
     def get(self, key):
         """Return a (possibly cached) return value of `func(key)`."""
-        item = None
-        if key in self.table:
-            item = self.table[key]
-            if item.freq < 0:
-                # Cache miss, item in G.
-                # (Items entering G have freq set to -1)
-                self.hit_ghosts += 1
-                self.misses += 1
-
-                # Re-cache the value and reset freq (import to do this before
-                # ensure_free!)
-                item.value = self.func(key)
-                item.freq = 0
-
-                # Add to M.
-                self.ensure_free()
-                self.insertM(item)
-
-                # We don't need to delete from G, that will happen
-                # automatically as we add values to G.
-            else:
-                # Cache hit! Update freq.
+        # Attributes used on the hit path are bound to locals because
+        # LOAD_FAST is cheaper than LOAD_ATTR.
+        table = self.table
+        idx = table.get(key)
+        ghost = False
+        if idx is not None:
+            freq = self.slots_freq
+            f = freq[idx]
+            if f < 128:
+                # Cache hit! Update freq. Indexing a constant tuple increments
+                # freq up to a maximum of 3 and is cheaper than calling min().
                 self.hits += 1
-                item.freq = min(item.freq + 1, 3)
-        else:
-            # Cache miss, unseen or forgotten key
-            self.misses += 1
-
-            # Calculate value and store in hash table.
-            value = self.func(key)
-            item = S3FIFOItem(key, value)
-            self.table[key] = item
-
-            # Insert into small fifo.
-            self.ensure_free()
-            self.insertS(item)
-
-        return item.value
-
-    def insertM(self, item):
-        item.freq = 0
-        self.M.appendleft(item)
-
-    def insertS(self, item):
-        self.S.appendleft(item)
-
-    def insertG(self, new_item):
-        # Evict an item if G is full. Items that have not been adopted into
-        # another queue are completely removed from the cache.
-        if len(self.G) == self.target_len_m:
-            tail_item = self.G.pop()
-            if tail_item.freq < 0:
-                del self.table[tail_item.key]
-
-        # Drop our reference to the value, possibly allowing it to be garbage
-        # collected.
-        new_item.value = None
-        new_item.freq = -1
-        self.G.appendleft(new_item)
-
-    def ensure_free(self):
-        "Ensure there is at least one location free for a new item"
-        while len(self.S) + len(self.M) >= self.maxlen:
+                freq[idx] = (1, 2, 3, 3)[f]
+                return self.slots_val[idx]
+
+            # Cache miss, key in G. We will add it to M rather than S in a
+            # new slot.
+            # (Slots entering G have freq set to 255)
+            self.hit_ghosts += 1
+            ghost = True
+        # else: Cache miss, unseen or forgotten key
+        self.misses += 1
+        value = self.func(key)
+
+        if ghost:
+            # Mark the ghost stale so that G doesn't delete key from the
+            # table when it pops the slot (important to do this before making
+            # room!)
+            freq[idx] = 254
+
+        # Make room. The loop body only runs when the cache is full and always
+        # dispatches through self so that subclasses can override evictS() and
+        # evictM(). The lengths change as we evict, but the limits don't, so
+        # bind them to locals.
+        maxlen = self.maxlen
+        target_len_m = self.target_len_m
+        while self.s_len + self.m_len >= maxlen:
             # The `or` isn't required because we're working with integers, but
             # there's no harm and you need it if you want to adapt this code to
             # sum sizes rather than count number of cached values.
-            if len(self.M) >= self.target_len_m or len(self.S) == 0:
+            if self.m_len >= target_len_m or self.s_len == 0:
                 self.evictM()
             else:
                 # We need the outer while loop because if every item in S is
@@ -257,33 +250,110 @@ class S3FIFO:
                 # anything to G and we will need to call evictM().
                 self.evictS()
 
+        # Store value in a slot and the hash table.
+        idx = self.free.pop()
+        self.slots_key[idx] = key
+        self.slots_val[idx] = value
+        self.slots_freq[idx] = 0
+        table[key] = idx
+        if ghost:
+            # This is insertM(), inlined.
+            self.M.appendleft(idx)
+            self.m_len += 1
+        else:
+            # Insert into small fifo.
+            self.S.appendleft(idx)
+            self.s_len += 1
+        return value
+
+    def get_many(self, keys):
+        """Return a list of (possibly cached) return values of `func(key)`.
+
+        Equivalent to `[self.get(key) for key in keys]`, but cache hits are
+        handled inline, without a call to `get` for each key.
+        """
+        table = self.table
+        freq = self.slots_freq
+        slots_val = self.slots_val
+        get = self.get
+        results = []
+        append = results.append
+        hits = 0
+        for key in keys:
+            idx = table.get(key)
+            if idx is not None:
+                f = freq[idx]
+                if f < 128:
+                    # Cache hit! Update freq.
+                    hits += 1
+                    freq[idx] = (1, 2, 3, 3)[f]
+                    append(slots_val[idx])
+                    continue
+            # Flush the hit count first in case func raises.
+            self.hits += hits
+            hits = 0
+            append(get(key))
+        self.hits += hits
+        return results
+
+    def insertM(self, idx):
+        self.slots_freq[idx] = 0
+        self.M.appendleft(idx)
+        self.m_len += 1
+
+    def insertG(self, idx):
+        # Evict a slot if G is full. Live ghosts are completely removed from
+        # the cache; stale ghosts were already re-adopted into M under a new
+        # slot.
+        if self.g_len == self.target_len_m:
+            tail = self.G.pop()
+            if self.slots_freq[tail] == 255:
+                del self.table[self.slots_key[tail]]
+            self.slots_key[tail] = None
+            self.free.append(tail)
+        else:
+            self.g_len += 1
+
+        # Drop our reference to the value, possibly allowing it to be garbage
+        # collected.
+        self.slots_val[idx] = None
+        self.slots_freq[idx] = 255
+        self.G.appendleft(idx)
+
     def evictM(self):
         # Evict something, completely removing it from the cache. This will
         # always eventually evict one item because reinserted items have their
         # frequency reduced.
-        while len(self.M) > 0:
-            tail_item = self.M.pop()
-            if tail_item.freq > 0:
-                # Reinsert
-                tail_item.freq -= 1
-                self.M.appendleft(tail_item)
-            else:
-                # Evict
-                # item may still be in G, set value = None to allow its value
-                # to be garbage collected.
-                tail_item.value = None
-                del self.table[tail_item.key]
-                return
-        assert False, "Unreachable!"
+        M = self.M
+        freq = self.slots_freq
+        assert self.m_len > 0, "Unreachable!"
+        tail = M[-1]
+        f = freq[tail]
+        while f > 0:
+            # Reinsert. Decrement freq in place and rotate the tail to the
+            # head, which is one C call rather than a pop() and appendleft().
+            freq[tail] = f - 1
+            M.rotate(1)
+            tail = M[-1]
+            f = freq[tail]
+
+        # Evict. Drop our references to the key and value, possibly allowing
+        # them to be garbage collected.
+        M.pop()
+        self.m_len -= 1
+        del self.table[self.slots_key[tail]]
+        self.slots_key[tail] = self.slots_val[tail] = None
+        self.free.append(tail)
 
     def evictS(self):
         # Promote items into M until we find an item we can demote to G or run
         # out of items.
-        while len(self.S) > 0:
+        while self.s_len > 0:
             # Move the tail item to another queue.
-            tail_item = self.S.pop()
-            if tail_item.freq > 0:
-                self.insertM(tail_item)
+            tail = self.S.pop()
+            self.s_len -= 1
+            if self.slots_freq[tail] > 0:
+                self.insertM(tail)
             else:
-                self.insertG(tail_item)
+                self.insertG(tail)
                 return
@@ -0,0 +1,193 @@
+# cython: language_level=3
+# Copyright Colin Caine 2023. MIT License.
+"""Compiled port of `s3fifo.S3FIFO`.
+
+This is the same algorithm as the pure-Python `s3fifo.S3FIFO` (see that class
+for documentation and references), but written as Cython `cdef class`es so
+that items have C-typed fields and the hot path (`get` on a cache hit) runs
+without going through the interpreter.
+
+`s3fifo.py` remains the reference implementation and the fallback for
+platforms where this module hasn't been compiled. `from s3fifo_native import
+S3FIFO` picks whichever is available.
+
+Build in place with `pip install -e .` or `cythonize -i s3fifo_c.pyx`.
+"""
+
+from collections import deque
+
+from cpython.dict cimport PyDict_GetItemWithError, PyDict_SetItem, PyDict_DelItem
+from cpython.ref cimport PyObject
+
+
+cdef class S3FIFOItem:
+    cdef public object key
+    cdef public object value
+    cdef public int freq
+    # True while G holds a reference to this item.
+    cdef public bint in_g
+
+    def __init__(self, key, value):
+        self.key = key
+        self.value = value
+        self.freq = 0
+        self.in_g = False
+
+
+cdef class S3FIFO:
+    """Cache calls to a function with S3FIFO.
+
+    Drop-in replacement for `s3fifo.S3FIFO`. Subclass `s3fifo.S3FIFO` rather
+    than this class if you want to override its methods from Python.
+    """
+
+    cdef public object func
+    cdef public Py_ssize_t maxlen, target_len_m
+    cdef public Py_ssize_t hits, hit_ghosts, misses
+    cdef public dict table
+    cdef public object S, M, G
+    # Items that nothing else refers to any more, for reuse by get.
+    cdef list _pool
+
+    def __init__(self, func, Py_ssize_t max_num_cached):
+        assert max_num_cached >= 10
+        self.func = func
+        cdef Py_ssize_t target_len_s = max_num_cached // 10
+        self.target_len_m = max_num_cached - target_len_s
+        self.maxlen = target_len_s + self.target_len_m
+
+        # Stats
+        self.hits = self.hit_ghosts = self.misses = 0
+
+        # hashtable of key => Item for each item in S, M, G
+        self.table = {}
+        # FIFOs of Items
+        self.S = deque()
+        self.M = deque()
+        self.G = deque()
+        self._pool = []
+
+    cpdef object get(self, object key):
+        """Return a (possibly cached) return value of `func(key)`."""
+        cdef S3FIFOItem item
+        # Unlike PyDict_GetItem, this raises if key can't be hashed or
+        # compared, before we call func.
+        cdef PyObject *found = PyDict_GetItemWithError(self.table, key)
+        if found is not NULL:
+            item = <S3FIFOItem>found
+            if item.freq < 0:
+                # Cache miss, item in G.
+                self.hit_ghosts += 1
+                self.misses += 1
+
+                # Re-cache the value and reset freq before ensure_free.
+                item.value = self.func(key)
+                item.freq = 0
+
+                # Add to M.
+                self.ensure_free()
+                self.insertM(item)
+            else:
+                # Cache hit! Update freq.
+                self.hits += 1
+                if item.freq < 3:
+                    item.freq += 1
+        else:
+            # Cache miss, unseen or forgotten key
+            self.misses += 1
+
+            # Calculate value and store in hash table.
+            value = self.func(key)
+            if self._pool:
+                item = self._pool.pop()
+                item.key = key
+                item.value = value
+                item.freq = 0
+            else:
+                item = S3FIFOItem(key, value)
+            PyDict_SetItem(self.table, key, item)
+
+            # Insert into small fifo.
+            self.ensure_free()
+            self.insertS(item)
+
+        return item.value
+
+    def get_many(self, keys):
+        """Return a list of (possibly cached) return values of `func(key)`.
+
+        Equivalent to `[self.get(key) for key in keys]`.
+        """
+        return [self.get(key) for key in keys]
+
+    cpdef insertM(self, S3FIFOItem item):
+        item.freq = 0
+        self.M.appendleft(item)
+
+    cpdef insertS(self, S3FIFOItem item):
+        self.S.appendleft(item)
+
+    cpdef insertG(self, S3FIFOItem new_item):
+        cdef S3FIFOItem tail_item
+        # Evict an item if G is full. Items that have not been adopted into
+        # another queue are completely removed from the cache.
+        if len(self.G) == self.target_len_m:
+            tail_item = self.G.pop()
+            tail_item.in_g = False
+            if tail_item.freq < 0:
+                # freq == -2 means evictM already removed it from the table.
+                if tail_item.freq == -1:
+                    PyDict_DelItem(self.table, tail_item.key)
+                tail_item.key = None
+                self._pool.append(tail_item)
+
+        # Drop our reference to the value, possibly allowing it to be garbage
+        # collected.
+        new_item.value = None
+        new_item.freq = -1
+        new_item.in_g = True
+        self.G.appendleft(new_item)
+
+    cpdef ensure_free(self):
+        "Ensure there is at least one location free for a new item"
+        while len(self.S) + len(self.M) >= self.maxlen:
+            if len(self.M) >= self.target_len_m or len(self.S) == 0:
+                self.evictM()
+            else:
+                self.evictS()
+
+    cpdef evictM(self):
+        cdef S3FIFOItem tail_item
+        # Evict something, completely removing it from the cache. This will
+        # always eventually evict one item because reinserted items have their
+        # frequency reduced.
+        while len(self.M) > 0:
+            tail_item = self.M.pop()
+            if tail_item.freq > 0:
+                # Reinsert
+                tail_item.freq -= 1
+                self.M.appendleft(tail_item)
+            else:
+                # Evict
+                tail_item.value = None
+                PyDict_DelItem(self.table, tail_item.key)
+                if tail_item.in_g:
+                    # Leave it for insertG to recycle.
+                    tail_item.freq = -2
+                else:
+                    tail_item.key = None
+                    self._pool.append(tail_item)
+                return
+        assert False, "Unreachable!"
+
+    cpdef evictS(self):
+        cdef S3FIFOItem tail_item
+        # Promote items into M until we find an item we can demote to G or run
+        # out of items.
+        while len(self.S) > 0:
+            tail_item = self.S.pop()
+            if tail_item.freq > 0:
+                self.insertM(tail_item)
+            else:
+                self.insertG(tail_item)
+                return
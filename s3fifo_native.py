@@ -0,0 +1,24 @@
+# Copyright Colin Caine 2023. MIT License.
+"""The fastest available S3FIFO.
+
+`S3FIFO` here is the compiled `s3fifo_c.S3FIFO` if it was built for this
+platform, otherwise it is the pure-Python `s3fifo.S3FIFO`. They behave
+identically, so this is the one to import unless you want to subclass it or
+read its internals, in which case use `s3fifo.S3FIFO`, the reference
+implementation.
+
+```python
+from s3fifo_native import S3FIFO, NATIVE
+```
+
+`NATIVE` is True if the compiled version was found.
+"""
+
+try:
+    from s3fifo_c import S3FIFO
+    NATIVE = True
+except ImportError:
+    from s3fifo import S3FIFO
+    NATIVE = False
+
+__all__ = ['S3FIFO', 'NATIVE']
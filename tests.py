@@ -1,17 +1,51 @@
 def tests():
     from s3fifo import S3FIFO
-    from other_fifos import EagerEvictionS3FIFO, S3FIFO3, S3FIFO4, FIFO, LRU
+    from other_fifos import EagerEvictionS3FIFO, S3FIFO3, S3FIFO4, S3FIFO_1bit, FIFO, LRU
     # Simple test
 
     f = lambda x: 2*x
     cache = S3FIFO(f, 20)
     assert [cache.get(x) for x in range(30)] == [f(x) for x in range(30)]
+    keys = [*range(30), *range(30)]
+    assert S3FIFO(f, 20).get_many(keys) == [f(x) for x in keys]
+    # Hits before a raising miss are still counted.
+    def g(x):
+        if x == 'boom':
+            raise ValueError(x)
+        return x
+    cache = S3FIFO(g, 20)
+    cache.get_many(range(5))
+    try:
+        cache.get_many([*range(5), 'boom'])
+    except ValueError:
+        assert cache.hits == 5
+    else:
+        assert False, "Expected ValueError"
 
     # Performance comparisons
 
     from collections import Counter
 
-    kinds = (S3FIFO, S3FIFO3, S3FIFO4, LRU, FIFO, EagerEvictionS3FIFO)
+    kinds = (S3FIFO, S3FIFO3, S3FIFO4, S3FIFO_1bit, LRU, FIFO, EagerEvictionS3FIFO)
+
+    # The compiled S3FIFO should behave identically to the pure-Python one.
+    try:
+        import s3fifo_c
+    except ImportError:
+        pass
+    else:
+        kinds += (s3fifo_c.S3FIFO,)
+        cache = s3fifo_c.S3FIFO(f, 20)
+        assert [cache.get(x) for x in range(30)] == [f(x) for x in range(30)]
+        assert cache.get_many(range(30)) == [f(x) for x in range(30)]
+        # Unhashable keys raise before func is called, as in s3fifo.S3FIFO.
+        calls = []
+        try:
+            s3fifo_c.S3FIFO(calls.append, 20).get([1])
+        except TypeError:
+            assert calls == []
+        else:
+            assert False, "Expected TypeError"
 
     def print_input_stats(name, inputs):
         N = len(inputs)
@@ -46,7 +80,10 @@ def tests():
         for idx, kind in enumerate(kinds[1:]):
             hr = (col[idx+1] - col[0] for col in hit_rates)
             formatted_rates = (f"{100*rate:>+4.0f}pp" for rate in hr)
-            print(f"{kind.__name__:20}\t", '\t'.join(formatted_rates), sep='')
+            name = kind.__name__
+            if kind.__module__ == 's3fifo_c':
+                name = f"s3fifo_c.{name}"
+            print(f"{name:20}\t", '\t'.join(formatted_rates), sep='')
 
     N = 1600
 